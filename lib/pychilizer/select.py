@@ -9,10 +9,12 @@ BIC = DB.BuiltInCategory
 class CatFilter(ISelectionFilter):
     def __init__(self, cat):
         self.cat = cat
+        # AllowElement runs for every element under the cursor, build the id once
+        self.cat_id = DB.ElementId(cat)
 
     def AllowElement(self, elem):
         try:
-            if elem.Category.Id.IntegerValue == int(self.cat):
+            if elem.Category.Id == self.cat_id:
                 return True
             else:
                 return False
@@ -49,9 +51,11 @@ def select_with_cat_filter(cat, message):
 
 def preselection_with_filter(cat):
     # use pre-selection of elements, but filter them by given category name
+    # build the category id once, not for every selected element
+    cat_id = DB.ElementId(cat)
     pre_selection = []
     for id in rpw.revit.uidoc.Selection.GetElementIds():
         sel_el = revit.doc.GetElement(id)
-        if sel_el.Category.Id.IntegerValue == int(cat):
+        if sel_el.Category and sel_el.Category.Id == cat_id:
             pre_selection.append(sel_el)
     return pre_selection
\ No newline at end of file
@@ -3,7 +3,7 @@
 
 from pyrevit import revit, DB, UI, forms, script
 from pyrevit.framework import List
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 from Autodesk.Revit import Exceptions
 from Autodesk.Revit.UI.Selection import ObjectType, ISelectionFilter
 from Autodesk.Revit.UI.Selection import Selection
@@ -95,14 +95,12 @@ collect_symbols = DB.FilteredElementCollector(doc) \
     .OfCategory(chosen_bic).WhereElementIsElementType()
 
 source_element = source_legend_component
-ordered_symbols = {}
+ordered_symbols = defaultdict(dict)
 
 for sym in collect_symbols:
     # cat = sym.get_Parameter(DB.BuiltInParameter.ELEM_CATEGORY_PARAM).AsValueString()
     fam = sym.get_Parameter(DB.BuiltInParameter.SYMBOL_FAMILY_NAME_PARAM).AsString()
     typ = sym.get_Parameter(DB.BuiltInParameter.SYMBOL_NAME_PARAM).AsString()
-    if fam not in ordered_symbols.keys():
-        ordered_symbols[fam] = {}
     ordered_symbols[fam][typ] = sym
 
 spacing = 1
@@ -13,8 +13,8 @@ cl = DB.FilteredElementCollector(doc)
 viewports = List[DB.ElementId]\
     ([i.ViewId for i in cl.OfCategory(DB.BuiltInCategory.OST_Viewports).WhereElementIsNotElementType()])
 
-views = List[DB.ElementId]\
-    ([i.Id for i in DB.FilteredElementCollector(doc).OfCategory(DB.BuiltInCategory.OST_Views).WhereElementIsNotElementType()])
+views = DB.FilteredElementCollector(doc).OfCategory(DB.BuiltInCategory.OST_Views).WhereElementIsNotElementType()\
+    .ToElementIds()
 
 unplaced_views = List[DB.ElementId]([v for v in views if v not in viewports])
 
@@ -2,59 +2,103 @@ __title__ = 'Door Tag Checker'
 __doc__ = 'Analyse if doors are tagged in views and check for inconsistencies.'
 
 
-from pyrevit import revit, DB, script
+import codecs
+import csv
+
+from pyrevit import revit, DB, script, HOST_APP
+from pyrevit.framework import List
+from pychilizer import database
 
 doc = revit.doc
 logger = script.get_logger()
 output = script.get_output()
 
+# print_table gets very slow with hundreds of rows, so I cap both tables.
+MAX_ROWS = 200
+
+# I resolve these API constants once instead of once per door or tag.
+MARK_BIP = DB.BuiltInParameter.ALL_MODEL_MARK
+INVALID_ID = DB.ElementId.InvalidElementId
+
+# Revit 2022 added tags with several references. I check the version once,
+# so I don't need a try/except for every tag.
+HAS_MULTI_REFERENCE_TAGS = HOST_APP.is_newer_than(2021)
+
+# Bits I use to remember where a door is tagged.
+TAGGED_IN_PLAN = 1
+TAGGED_IN_ELEVATION = 2
+
+# For every combination of those bits I know the tag columns up front:
+# tagged in plans, tagged in elevations and the status.
+# If both sides match (both tagged or both not tagged), I say OK.
+# If one is tagged and the other is not, it says Inconsistent.
+TAG_COLUMNS_BY_STATUS = (
+    ("No", "No", "OK"),              # not tagged anywhere
+    ("Yes", "No", "Inconsistent"),   # only tagged in plans
+    ("No", "Yes", "Inconsistent"),   # only tagged in elevations
+    ("Yes", "Yes", "OK"),            # tagged in both
+)
+
 
 def safe_name(elem, fallback=""):
     # I want to get a readable name for an element.
-    # If the element has no Name property, I return a fallback string.
+    # database.get_name reads Name through DB.Element, so it also works on door types,
+    # where IronPython can't read FamilySymbol.Name directly.
+    # If reading the name fails, I use the element id instead.
     if not elem:
         return fallback
     try:
-        return elem.Name
+        return database.get_name(elem)
     except:
-        try:
-            return str(elem.Id)
-        except:
-            return fallback
+        return str(elem.Id)
 
 
-def get_views_of_type(vtype):
+def get_views_of_type(view_class, vtype):
     # I get all non-template views of a given type.
     # For example all floor plans or all elevations.
-    views = []
+    # I let Revit filter by the view class (ViewPlan, ViewSection...) first,
+    # so Python only reads ViewType on views that can match.
+    # I iterate the collector directly instead of copying it into a list first.
     allviews = DB.FilteredElementCollector(doc) \
-                 .OfClass(DB.View) \
-                 .ToElements()
-    for v in allviews:
-        if v.IsTemplate:
-            continue
-        if v.ViewType == vtype:
-            views.append(v)
-    return views
-
-
-def get_doors():
-    # I collect all door instances in the whole project.
-    doors = DB.FilteredElementCollector(doc) \
-              .OfClass(DB.FamilyInstance) \
-              .OfCategory(DB.BuiltInCategory.OST_Doors) \
-              .WhereElementIsNotElementType() \
-              .ToElements()
-    return doors
+                 .OfClass(view_class)
+    return [v for v in allviews if not v.IsTemplate and v.ViewType == vtype]
+
+
+def get_doors_and_door_tags():
+    # I collect all door instances and all tags that can point at a door
+    # in one pass over the project, then split them by class.
+    # Door tags, multi-category tags, keynotes and material tags can all sit on a door,
+    # so I let Revit skip every other tag before it reaches Python.
+    cats = List[DB.BuiltInCategory]([DB.BuiltInCategory.OST_Doors,
+                                     DB.BuiltInCategory.OST_DoorTags,
+                                     DB.BuiltInCategory.OST_MultiCategoryTags,
+                                     DB.BuiltInCategory.OST_KeynoteTags,
+                                     DB.BuiltInCategory.OST_MaterialTags])
+    elems = DB.FilteredElementCollector(doc) \
+              .WherePasses(DB.ElementMulticategoryFilter(cats)) \
+              .WhereElementIsNotElementType()
+
+    doors = []
+    tags = []
+    for el in elems:
+        if isinstance(el, DB.IndependentTag):
+            tags.append(el)
+        elif isinstance(el, DB.FamilyInstance):
+            # OST_Doors can also hold DirectShapes, for example from IFC imports.
+            # They have no door type or level, so I only keep real door families.
+            doors.append(el)
+    return doors, tags
 
 
 def get_mark_value(door):
     # I read the Mark parameter on a door (if it exists).
     try:
-        p = door.get_Parameter(DB.BuiltInParameter.ALL_MODEL_MARK)
+        p = door.get_Parameter(MARK_BIP)
         if p:
+            # Mark is a text parameter, an empty string already means "no value",
+            # so I only ask for the value string when AsString gives nothing at all.
             s = p.AsString()
-            if s:
+            if s is not None:
                 return s
             s2 = p.AsValueString()
             if s2:
@@ -64,205 +108,193 @@ def get_mark_value(door):
     return ""
 
 
-def get_referenced_elements_from_tag(tag):
+def get_referenced_ids_from_tag(tag):
     """
-    I try multiple methods to get the elements this tag is attached to. (Not sure everything is necessary)
-    I return a list of Element objects (not ElementId).
+    I get the ids of the elements this tag is attached to.
+    I return a list of id integers, I don't need the elements themselves.
     """
-    elements = []
-
-    # GetTaggedLocalElements 
-    try:
-        local_elems = tag.GetTaggedLocalElements()
-        if local_elems:
-            for e in local_elems:
-                # Sometimes this already returns elements.
-                # Sometimes it returns ids. I do both.
-                try:
-                    if isinstance(e, DB.Element):
-                        elements.append(e)
-                        continue
-                except:
-                    pass
-                try:
-                    if isinstance(e, DB.ElementId):
-                        elem = doc.GetElement(e)
-                        if elem:
-                            elements.append(elem)
-                except:
-                    pass
-            if elements:
-                return elements
-    except:
-        pass
-
-    #GetTaggedLocalElementIds (if available)
-    try:
-        local_ids = tag.GetTaggedLocalElementIds()
-        if local_ids:
-            for eid in local_ids:
-                try:
-                    elem = doc.GetElement(eid)
-                    if elem:
-                        elements.append(elem)
-                except:
-                    pass
-            if elements:
-                return elements
-    except:
-        pass
-
-    # GetTaggedElementIds (multi reference style)
-    try:
-        ref_ids = []
-        refs = tag.GetTaggedElementIds()
-        if refs:
-            for r in refs:
-                try:
-                    eid = r.ElementId
-                    if eid and eid != DB.ElementId.InvalidElementId:
-                        ref_ids.append(eid)
-                except:
-                    pass
-        for eid in ref_ids:
-            try:
-                elem = doc.GetElement(eid)
-                if elem:
-                    elements.append(elem)
-            except:
-                pass
-        if elements:
-            return elements
-    except:
-        pass
-
-    # TaggedElementId (single reference)
-    try:
-        ref = tag.TaggedElementId
-        if ref and ref.ElementId and ref.ElementId != DB.ElementId.InvalidElementId:
-            elem = doc.GetElement(ref.ElementId)
-            if elem:
-                elements.append(elem)
-                return elements
-    except:
-        pass
+    if HAS_MULTI_REFERENCE_TAGS:
+        ref_ids = tag.GetTaggedLocalElementIds()
+    else:
+        ref_ids = [tag.TaggedLocalElementId]
 
-    # If nothing works, I return an empty list.
-    return elements
+    return [eid.IntegerValue for eid in ref_ids if eid != INVALID_ID]
 
 
-def get_tagged_door_ids_in_views(views, door_id_set):
+def get_door_tag_status(tags, plan_views, elev_views, door_id_set):
     """
-    For a list of views, I find which doors are tagged at least once.
-    I return a set of door ids.
+    I go through every door tag once and keep only the ones in my plans and elevations.
+    This is much faster than running one collector per view.
+    For every tagged door I store a small bit mask:
+    TAGGED_IN_PLAN if a plan tags it, TAGGED_IN_ELEVATION if an elevation tags it, or both.
+    I return a dict of {door id int: bits}.
     """
-    tagged_door_ids = set()
-
-    for view in views:
-        # I get all tags in this view.
-        tags = DB.FilteredElementCollector(doc, view.Id) \
-                 .OfClass(DB.IndependentTag) \
-                 .WhereElementIsNotElementType() \
-                 .ToElements()
-
-        for tag in tags:
-            tagged_elems = get_referenced_elements_from_tag(tag)
-
-            for elem in tagged_elems:
-                # I only care about elements whose id is in my door set.
-                try:
-                    elem_id = elem.Id
-                except:
-                    continue
-
-                if elem_id in door_id_set:
-                    tagged_door_ids.add(elem_id)
+    # I map every plan and elevation id straight to its bit and the view itself,
+    # so sorting a tag is a single dict lookup.
+    bit_by_view = {}
+    for v in plan_views:
+        bit_by_view[v.Id.IntegerValue] = (TAGGED_IN_PLAN, v)
+    for v in elev_views:
+        bit_by_view[v.Id.IntegerValue] = (TAGGED_IN_ELEVATION, v)
+
+    # A tag only counts if it can be seen in its view, so I skip tags hidden in the view
+    # and tags whose category is hidden in Visibility/Graphics.
+    # Every tag of a category is hidden or shown together in a view,
+    # so I ask Revit once per view and category.
+    # I don't check the crop region, view filters or temporary hide/isolate,
+    # so a tag that is only hidden that way still counts.
+    category_hidden = {}
+
+    status_by_door = {}
+    get_status = status_by_door.get
+
+    # Once every door is tagged in both plans and elevations,
+    # the remaining tags can't change anything, so I stop early.
+    fully_tagged = TAGGED_IN_PLAN | TAGGED_IN_ELEVATION
+    fully_tagged_count = 0
+    door_count = len(door_id_set)
+
+    for tag in tags:
+        owner_view_id = tag.OwnerViewId.IntegerValue
+        view_entry = bit_by_view.get(owner_view_id)
+        if view_entry is None:
+            # The tag is in a section, 3D view, sheet...
+            continue
+        bit, view = view_entry
+
+        cat_id = tag.Category.Id
+        hidden_key = (owner_view_id, cat_id.IntegerValue)
+        hidden = category_hidden.get(hidden_key)
+        if hidden is None:
+            hidden = view.GetCategoryHidden(cat_id)
+            category_hidden[hidden_key] = hidden
+        if hidden or tag.IsHidden(view):
+            continue
 
-    return tagged_door_ids
+        for elem_id in get_referenced_ids_from_tag(tag):
+            # I only care about elements whose id is in my door set,
+            # so there is no need to fetch the element from the document.
+            if elem_id in door_id_set:
+                old_status = get_status(elem_id, 0)
+                new_status = old_status | bit
+                if new_status != old_status:
+                    status_by_door[elem_id] = new_status
+                    if new_status == fully_tagged:
+                        fully_tagged_count += 1
+        if fully_tagged_count == door_count:
+            break
+
+    return status_by_door
+
+
+def export_rows_to_csv(rows, columns, file_id):
+    # I write every row to a csv file next to the other pyRevit data files.
+    # Writing a file is much faster than rendering a big table in the output window.
+    path = script.get_document_data_file(file_id, "csv")
+    # The BOM tells Excel the file is utf-8, otherwise non-ASCII names come out garbled.
+    with codecs.open(path, "w", "utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow((str(row[0].IntegerValue),) + row[1:])
+    return path
+
+
+def linkify_rows(rows):
+    # I turn the door id in the first column into a clickable link.
+    return [(output.linkify(row[0]),) + row[1:] for row in rows]
+
+
+def print_rows(rows, columns, file_id):
+    # I print at most MAX_ROWS rows, and when there are more
+    # I save the full list to a csv file instead of rendering it.
+    output.print_table(
+        table_data=linkify_rows(rows[:MAX_ROWS]),
+        columns=columns
+    )
+    if len(rows) > MAX_ROWS:
+        csv_path = export_rows_to_csv(rows, columns, file_id)
+        output.print_md("_Showing the first {} of {} doors._".format(MAX_ROWS, len(rows)))
+        # Inside a code span markdown keeps the backslashes of the path.
+        # The link needs forward slashes and no spaces to work as a file url.
+        csv_url = "file:///" + csv_path.replace("\\", "/").replace(" ", "%20")
+        output.print_md("Full list saved to: `{}` ([open]({}))".format(csv_path, csv_url))
 
 
 def run():
     # Main entry point when I click the pychilizer button.
 
-    doors = get_doors()
+    doors, door_tags = get_doors_and_door_tags()
     if not doors:
         output.print_md("No doors found in the model.")
         return
 
     # store all door ids in a set so I can test quickly.
-    door_ids = set(d.Id for d in doors)
+    # Plain integers hash and compare in Python, without going through .NET.
+    door_ids = set(d.Id.IntegerValue for d in doors)
 
     # I get all floor plans and all elevations.
-    plan_views = get_views_of_type(DB.ViewType.FloorPlan)
-    elev_views = get_views_of_type(DB.ViewType.Elevation)
+    plan_views = get_views_of_type(DB.ViewPlan, DB.ViewType.FloorPlan)
+    elev_views = get_views_of_type(DB.ViewSection, DB.ViewType.Elevation)
 
-    # For plans: which doors have at least one tag in any plan view.
-    doors_tagged_in_plans = get_tagged_door_ids_in_views(plan_views, door_ids)
+    # I read all tags in one go and note, for every door,
+    # if it is tagged in any plan view and/or in any elevation view.
+    door_tag_status = get_door_tag_status(door_tags, plan_views, elev_views, door_ids)
 
-    # For elevations: which doors have at least one tag in any elevation view.
-    doors_tagged_in_elevs = get_tagged_door_ids_in_views(elev_views, door_ids)
-
-    all_rows = []
+    # I know there is one row per door, so I size the list up front.
+    all_rows = [None] * len(doors)
     inconsistent_rows = []
 
-    for door in doors:
+    # Many doors share the same type and level, so I only look each one up once.
+    type_name_cache = {}
+    level_name_cache = {}
+
+    add_inconsistent_row = inconsistent_rows.append
+
+    for i, door in enumerate(doors):
         did = door.Id
-        id_link = output.linkify(did)
 
-        type_elem = doc.GetElement(door.GetTypeId())
-        type_name = safe_name(type_elem, "No Type")
+        type_id = door.GetTypeId()
+        type_name = type_name_cache.get(type_id.IntegerValue)
+        if type_name is None:
+            type_name = safe_name(doc.GetElement(type_id), "No Type")
+            type_name_cache[type_id.IntegerValue] = type_name
 
-        level_elem = doc.GetElement(door.LevelId)
-        level_name = safe_name(level_elem, "")
+        level_id = door.LevelId
+        level_name = level_name_cache.get(level_id.IntegerValue)
+        if level_name is None:
+            level_name = safe_name(doc.GetElement(level_id), "")
+            level_name_cache[level_id.IntegerValue] = level_name
 
         mark_val = get_mark_value(door)
 
-        plan_tagged = did in doors_tagged_in_plans
-        elev_tagged = did in doors_tagged_in_elevs
-
-        plan_text = "Yes" if plan_tagged else "No"
-        elev_text = "Yes" if elev_tagged else "No"
-
-        # If both sides match (both tagged or both not tagged), I say OK.
-        # If one is tagged and the other is not, it says Inconsistent.
-        if plan_tagged == elev_tagged:
-            status = "OK"
-        else:
-            status = "Inconsistent"
-
-        row = [
-            id_link,
-            type_name,
-            level_name,
-            mark_val,
-            plan_text,
-            elev_text,
-            status
-        ]
-
-        all_rows.append(row)
-        if status == "Inconsistent":
-            inconsistent_rows.append(row)
+        # The tag columns come straight from a table indexed by the tag bits.
+        tag_status = door_tag_status.get(did.IntegerValue, 0)
+
+        # I keep the raw id here and only linkify the rows I actually print.
+        # A tuple is smaller than a list and the same row is shared by both tables.
+        row = (did, type_name, level_name, mark_val) + TAG_COLUMNS_BY_STATUS[tag_status]
+
+        all_rows[i] = row
+        if tag_status == TAGGED_IN_PLAN or tag_status == TAGGED_IN_ELEVATION:
+            add_inconsistent_row(row)
 
     # I print the results in the pyRevit output window.
+    columns = ["Door Id", "Type", "Level", "Mark", "Tagged in plans", "Tagged in elevations", "Status"]
     output.print_md("## Door tag presence in plans and elevations")
 
     output.print_md("### Doors with inconsistent tagging")
     if inconsistent_rows:
-        output.print_table(
-            table_data=inconsistent_rows,
-            columns=["Door Id", "Type", "Level", "Mark", "Tagged in plans", "Tagged in elevations", "Status"]
-        )
+        # When doors are tagged in plans only, almost every door lands here,
+        # so this table gets the same cap as the summary.
+        print_rows(inconsistent_rows, columns, "DoorTagCheckerInconsistent")
     else:
         output.print_md("No inconsistencies found.")
 
     output.print_md("### All doors summary")
-    output.print_table(
-        table_data=all_rows,
-        columns=["Door Id", "Type", "Level", "Mark", "Tagged in plans", "Tagged in elevations", "Status"]
-    )
+    print_rows(all_rows, columns, "DoorTagChecker")
 
-    logger.info("Finished checking door tags for " + str(len(all_rows)) + " doors.")
+    logger.info("Finished checking door tags for {} doors.".format(len(all_rows)))
 
 
-run()
\ No newline at end of file
+run()
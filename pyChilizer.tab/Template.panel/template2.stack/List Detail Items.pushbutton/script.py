@@ -1,7 +1,7 @@
 """List Detail Items"""
 
 from pyrevit import revit, DB, UI, HOST_APP, forms, script
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 from Autodesk.Revit import Exceptions
 from rpw.ui.forms import (FlexForm, Label, ComboBox, Separator, Button)
 
@@ -74,21 +74,17 @@ coll_dc_types = DB.FilteredElementCollector(revit.doc).OfCategory(DB.BuiltInCate
 dc_viewbased = [dc for dc in coll_dc_types if dc.Family.FamilyPlacementType == DB.FamilyPlacementType.ViewBased]
 dc_curvebased = [dc for dc in coll_dc_types if dc.Family.FamilyPlacementType == DB.FamilyPlacementType.CurveBasedDetail]
 
-dict_vb = {}
-dict_cb = {}
+dict_vb = defaultdict(dict)
+dict_cb = defaultdict(dict)
 
 for sym in dc_viewbased:
     fam = sym.get_Parameter(DB.BuiltInParameter.SYMBOL_FAMILY_NAME_PARAM).AsString()
     typ = sym.get_Parameter(DB.BuiltInParameter.SYMBOL_NAME_PARAM).AsString()
-    if fam not in dict_vb.keys():
-        dict_vb[fam] = {}
     dict_vb[fam][typ] = sym
 
 for sym in dc_curvebased:
     fam = sym.get_Parameter(DB.BuiltInParameter.SYMBOL_FAMILY_NAME_PARAM).AsString()
     typ = sym.get_Parameter(DB.BuiltInParameter.SYMBOL_NAME_PARAM).AsString()
-    if fam not in dict_cb.keys():
-        dict_cb[fam] = {}
     dict_cb[fam][typ] = sym
 
 